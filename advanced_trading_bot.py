@@ -1,318 +1,673 @@
-import os
-import asyncio
-import logging
-import json
-import aiohttp
-import hmac
-import hashlib
-import time
-from urllib.parse import urlencode
-from binance.client import Client
-from binance.enums import *
-from binance.helpers import round_step_size
-import numpy as np
-
-# Setup logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
-
-# Binance API credentials from environment variables
-API_KEY = os.getenv('BINANCE_API_KEY')
-API_SECRET = os.getenv('BINANCE_API_SECRET').encode()
-
-# Trading parameters
-TRADE_SYMBOL = 'BONKUSDT'
-ORDER_AMOUNT_USDT = 100  # Fixed amount to spend on each buy order
-ORDER_BOOK_DEPTH = 20  # Top 20 levels of order book
-MIN_PROFIT_MARGIN = 0.0044  # 0.44% to cover 0.11% buy fee, 0.11% sell fee, and 0.22% profit margin
-DECIMAL_PRECISION = 2  # Decimal precision for order quantity
-COOLDOWN_PERIOD = 60  # Cooldown period in seconds (1 minute)
-SAFETY_PROFIT_THRESHOLD = 0.0044  # Safety profit threshold set to 0.44%
-TRADE_FEE_PERCENT = 0.0011  # 0.11% trade fee per transaction
-
-# Initialize Binance client
-client = Client(API_KEY, API_SECRET.decode())
-
-# Data structures
-order_book = {
-    'bids': [],
-    'asks': []
-}
-
-position_open = False  # Track if there is an open position
-order_id = None  # Track the current open order ID
-last_sell_time = 0  # Track the time of the last sell order
-historical_prices = []  # Track historical prices for moving average calculation
-buy_price = 0  # Track the buy price for the current position
-current_sell_price = 0  # Track the current sell price
-ma_crossed = False  # Track if the MA has crossed up
-
-async def get_server_time_diff(session):
-    """Get the server time difference."""
-    url = 'https://api.binance.com/api/v3/time'
-    async with session.get(url) as response:
-        server_time = await response.json()
-        local_time = int(asyncio.get_event_loop().time() * 1000)
-        return server_time['serverTime'] - local_time
-
-def create_signed_payload(params, recv_window=5000):
-    """Create a signed payload for the API request."""
-    params['recvWindow'] = recv_window
-    query_string = urlencode(params)
-    signature = hmac.new(API_SECRET, query_string.encode('utf-8'), hashlib.sha256).hexdigest()
-    params['signature'] = signature
-    return params
-
-def update_order_book(data):
-    """Update the order book with the latest data."""
-    global order_book
-    order_book['bids'] = sorted([(float(price), float(quantity)) for price, quantity in data['bids']], key=lambda x: -x[0])
-    order_book['asks'] = sorted([(float(price), float(quantity)) for price, quantity in data['asks']], key=lambda x: x[0])
-    logger.info("Order book updated")
-
-async def get_account_balance(session, asset, time_diff, retries=3):
-    """Get the current account balance for the given asset."""
-    url = 'https://api.binance.com/api/v3/account'
-    headers = {'X-MBX-APIKEY': API_KEY}
-    params = {'timestamp': int(asyncio.get_event_loop().time() * 1000) + time_diff}
-    signed_params = create_signed_payload(params)
-    for attempt in range(retries):
-        async with session.get(url, headers=headers, params=signed_params) as response:
-            account_info = await response.json()
-            if 'balances' in account_info:
-                for balance in account_info['balances']:
-                    if balance['asset'] == asset:
-                        return float(balance['free'])
-            logger.error(f"Error fetching account balance: {account_info}")
-            if 'code' in account_info and account_info['code'] == -1021:
-                time_diff = await get_server_time_diff(session)
-    return 0.0
-
-async def get_exchange_info(session):
-    """Fetch exchange information for the trading pair."""
-    url = 'https://api.binance.com/api/v3/exchangeInfo'
-    async with session.get(url) as response:
-        exchange_info = await response.json()
-        for symbol_info in exchange_info['symbols']:
-            if symbol_info['symbol'] == TRADE_SYMBOL:
-                min_lot_size, tick_size = None, None
-                for filter_info in symbol_info['filters']:
-                    if filter_info['filterType'] == 'LOT_SIZE':
-                        min_lot_size = float(filter_info['minQty'])
-                    if filter_info['filterType'] == 'PRICE_FILTER':
-                        tick_size = float(filter_info['tickSize'])
-                return min_lot_size, tick_size
-    return None, None
-
-async def get_historical_prices(session, symbol, interval, limit=100):
-    """Fetch historical price data."""
-    url = f'https://api.binance.com/api/v3/klines?symbol={symbol}&interval={interval}&limit={limit}'
-    async with session.get(url) as response:
-        klines = await response.json()
-        closing_prices = [float(kline[4]) for kline in klines]
-        logger.info(f"Fetched {len(closing_prices)} historical prices")
-        return closing_prices
-
-def calculate_moving_averages(prices, window):
-    """Calculate moving averages."""
-    return np.convolve(prices, np.ones(window), 'valid') / window
-
-def calculate_fees(amount, price):
-    """Calculate trading fees."""
-    fee = amount * price * TRADE_FEE_PERCENT
-    return fee
-
-def calculate_min_sell_price(buy_price, amount):
-    """Calculate the minimum sell price to cover fees and profit margin."""
-    buy_fee = calculate_fees(amount, buy_price)
-    sell_fee = calculate_fees(amount, buy_price * (1 + MIN_PROFIT_MARGIN))
-    min_sell_price = buy_price + buy_fee / amount + sell_fee / amount + buy_price * MIN_PROFIT_MARGIN
-    return min_sell_price
-
-def round_quantity(quantity, step_size):
-    """Round the quantity according to the step size."""
-    return round_step_size(quantity, step_size)
-
-async def place_buy_order(session, time_diff, min_lot_size, tick_size):
-    """Place a buy order with a fixed USDT amount."""
-    global position_open, order_id, last_sell_time, historical_prices, buy_price, current_sell_price, ma_crossed
-    current_time = time.time()
-    if position_open or (current_time - last_sell_time < COOLDOWN_PERIOD) or ma_crossed:
-        logger.info("Skipping buy order due to open position, cooldown period, or MA cross")
-        return
-
-    if len(historical_prices) < 30:
-        logger.info("Not enough data to calculate moving averages")
-        return
-    ma3 = calculate_moving_averages(historical_prices[-30:], 3)
-    ma6 = calculate_moving_averages(historical_prices[-30:], 6)
-    logger.info(f"MA3: {ma3[-1]}, MA6: {ma6[-1]}")
-    if ma3[-1] <= ma6[-1]:
-        logger.info("MA3 has not crossed above MA6, skipping buy order")
-        return
-
-    if not order_book['bids'] or not order_book['asks']:
-        return
-    best_bid = order_book['bids'][0][0]
-
-    buy_price = best_bid
-    min_sell_price = calculate_min_sell_price(buy_price, ORDER_AMOUNT_USDT / buy_price)
-    potential_profit = ((min_sell_price - buy_price) / buy_price) * 100
-
-    if potential_profit < (MIN_PROFIT_MARGIN * 100):
-        logger.info("Potential profit is less than the minimum profit margin, skipping buy order")
-        return
-
-    quantity = ORDER_AMOUNT_USDT / buy_price
-    quantity = round_quantity(quantity, tick_size)
-    quantity = "{:.8f}".format(quantity).rstrip('0').rstrip('.')  # Ensure quantity has correct precision
-    if float(quantity) < min_lot_size:
-        logger.error(f"Calculated quantity {quantity} is less than minimum lot size {min_lot_size}")
-        return
-    url = 'https://api.binance.com/api/v3/order'
-    params = {
-        'symbol': TRADE_SYMBOL,
-        'side': SIDE_BUY,
-        'type': ORDER_TYPE_LIMIT,
-        'timeInForce': TIME_IN_FORCE_GTC,
-        'quantity': quantity,
-        'price': f"{buy_price:.8f}".rstrip('0').rstrip('.'),  # Ensure price has correct precision
-        'timestamp': int(asyncio.get_event_loop().time() * 1000) + time_diff
-    }
-    signed_params = create_signed_payload(params)
-    headers = {'X-MBX-APIKEY': API_KEY}
-    async with session.post(url, headers=headers, params=signed_params) as response:
-        order = await response.json()
-        if 'code' in order:
-            logger.error(f"Error placing buy order: {order}")
-        else:
-            logger.info(f"Buy order placed: {order}")
-            position_open = True  # Update the position status
-            order_id = order['orderId']  # Store the order ID
-            current_sell_price = order_book['asks'][0][0]  # Initial sell price based on best ask
-            ma_crossed = True  # Set the MA cross flag
-        return order
-
-async def place_sell_order(session, time_diff, min_lot_size, tick_size, sell_price=None):
-    """Place a sell order for all available quantity."""
-    global position_open, order_id, last_sell_time, buy_price, ma_crossed
-    asset = TRADE_SYMBOL.replace('USDT', '')
-    quantity = await get_account_balance(session, asset, time_diff)
-    if quantity <= 0:
-        return
-    quantity = round_quantity(quantity, tick_size)
-    quantity = "{:.8f}".format(quantity).rstrip('0').rstrip('.')  # Ensure quantity has correct precision
-    if float(quantity) < min_lot_size:
-        logger.error(f"Calculated quantity {quantity} is less than minimum lot size {min_lot_size}")
-        return
-    if not order_book['bids']:
-        logger.error("Order book is empty, cannot place sell order")
-        return
-
-    best_bid = order_book['bids'][0][0]
-    min_sell_price = calculate_min_sell_price(buy_price, float(quantity))
-    if sell_price is None:
-        if best_bid > min_sell_price:
-            sell_price = best_bid
-        else:
-            sell_price = min_sell_price
-        sell_price = round_quantity(sell_price, tick_size)
-    elif sell_price < min_sell_price:
-        sell_price = min_sell_price
-
-    url = 'https://api.binance.com/api/v3/order'
-    params = {
-        'symbol': TRADE_SYMBOL,
-        'side': SIDE_SELL,
-        'type': ORDER_TYPE_LIMIT,
-        'timeInForce': TIME_IN_FORCE_GTC,
-        'quantity': quantity,
-        'price': f"{sell_price:.8f}".rstrip('0').rstrip('.'),  # Ensure price has correct precision
-        'timestamp': int(asyncio.get_event_loop().time() * 1000) + time_diff
-    }
-    signed_params = create_signed_payload(params)
-    headers = {'X-MBX-APIKEY': API_KEY}
-    async with session.post(url, headers=headers, params=signed_params) as response:
-        order = await response.json()
-        if 'code' in order:
-            logger.error(f"Error placing sell order: {order}")
-        else:
-            logger.info(f"Sell order placed: {order}")
-            position_open = False  # Update the position status
-            order_id = None  # Reset the order ID
-            last_sell_time = time.time()  # Update the last sell time
-            ma_crossed = False  # Reset the MA cross flag after a sell order is executed
-        return order
-
-async def check_open_order(session, time_diff):
-    """Check if there is an open order."""
-    global order_id, position_open
-    if not order_id:
-        return
-    url = 'https://api.binance.com/api/v3/order'
-    params = {
-        'symbol': TRADE_SYMBOL,
-        'orderId': order_id,
-        'timestamp': int(asyncio.get_event_loop().time() * 1000) + time_diff
-    }
-    signed_params = create_signed_payload(params)
-    headers = {'X-MBX-APIKEY': API_KEY}
-    async with session.get(url, headers=headers, params=signed_params) as response:
-        order = await response.json()
-        if 'status' in order and order['status'] in ['FILLED', 'CANCELED', 'REJECTED', 'EXPIRED']:
-            position_open = False
-            order_id = None
-        else:
-            position_open = True
-
-async def check_break_even_sell_order(session, time_diff, min_lot_size, tick_size):
-    """Check for break-even sell order."""
-    global position_open, buy_price
-    if not position_open or buy_price == 0:
-        return
-    if not order_book['bids']:
-        logger.error("Order book is empty, cannot check break-even sell order")
-        return
-
-    best_bid = order_book['bids'][0][0]
-    current_profit = ((best_bid - buy_price) / buy_price) * 100
-
-    min_sell_price = calculate_min_sell_price(buy_price, await get_account_balance(session, TRADE_SYMBOL.replace('USDT', ''), time_diff))
-    if current_profit <= SAFETY_PROFIT_THRESHOLD:
-        logger.info("Potential profit is diminishing, placing a sell order at 0.44% profit")
-        await place_sell_order(session, time_diff, min_lot_size, tick_size, sell_price=min_sell_price)
-
-async def scalping_strategy(session, time_diff, min_lot_size, tick_size):
-    """Scalping strategy main logic."""
-    await check_open_order(session, time_diff)
-    await check_break_even_sell_order(session, time_diff, min_lot_size, tick_size)
-    await place_sell_order(session, time_diff, min_lot_size, tick_size)
-    await place_buy_order(session, time_diff, min_lot_size, tick_size)
-
-async def handle_socket_msg(session, msg, time_diff, min_lot_size, tick_size):
-    """Handle incoming websocket messages."""
-    if msg['e'] == 'depthUpdate':
-        update_order_book({
-            'bids': msg['b'],
-            'asks': msg['a']
-        })
-        await scalping_strategy(session, time_diff, min_lot_size, tick_size)
-
-async def listen_to_depth_stream(session, time_diff, min_lot_size, tick_size):
-    """Websocket listener for order book depth stream."""
-    url = f'wss://stream.binance.com:9443/ws/{TRADE_SYMBOL.lower()}@depth'
-    async with session.ws_connect(url) as ws:
-        async for msg in ws:
-            msg_data = json.loads(msg.data)
-            await handle_socket_msg(session, msg_data, time_diff, min_lot_size, tick_size)
-
-async def main():
-    """Main execution loop."""
-    async with aiohttp.ClientSession() as session:
-        time_diff = await get_server_time_diff(session)
-        min_lot_size, tick_size = await get_exchange_info(session)
-        historical_prices.extend(await get_historical_prices(session, TRADE_SYMBOL, '3m'))
-        await listen_to_depth_stream(session, time_diff, min_lot_size, tick_size)
-
-if __name__ == '__main__':
-    asyncio.run(main())
+import os
+import asyncio
+import collections
+import logging
+import logging.handlers
+import queue
+import aiohttp
+import hmac
+import math
+import msgspec
+import ssl
+import time
+import uuid
+from dataclasses import dataclass, field
+import numpy as np
+from numba import njit
+from picows import ws_connect, WSFrame, WSListener, WSMsgType, WSTransport
+from sortedcontainers import SortedDict
+
+try:
+    import uvloop
+except ImportError:  # uvloop is optional (and unavailable on Windows)
+    uvloop = None
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:  # orjson is optional; fall back to the stdlib codec
+    import json
+
+    _json_loads = json.loads
+    _json_dumps = lambda obj: json.dumps(obj).encode()
+
+# Setup logging. Records are handed to a queue and formatted/written on a
+# background thread so synchronous stderr writes never block the event loop.
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(_log_queue, *logging.getLogger().handlers)
+logging.getLogger().handlers = [logging.handlers.QueueHandler(_log_queue)]
+_log_listener.start()
+logger = logging.getLogger(__name__)
+
+# Binance API credentials from environment variables
+API_KEY = os.getenv('BINANCE_API_KEY')
+API_SECRET = os.getenv('BINANCE_API_SECRET').encode()
+
+# Trading parameters
+TRADE_SYMBOL = 'BONKUSDT'
+ORDER_AMOUNT_USDT = 100  # Fixed amount to spend on each buy order
+ORDER_BOOK_DEPTH = 20  # Top 20 levels of order book
+MIN_PROFIT_MARGIN = 0.0044  # 0.44% to cover 0.11% buy fee, 0.11% sell fee, and 0.22% profit margin
+DECIMAL_PRECISION = 2  # Decimal precision for order quantity
+COOLDOWN_PERIOD = 60  # Cooldown period in seconds (1 minute)
+SAFETY_PROFIT_THRESHOLD = 0.0044  # Safety profit threshold set to 0.44%
+TRADE_FEE_PERCENT = 0.0011  # 0.11% trade fee per transaction
+MIN_EVAL_INTERVAL = 0.1  # Minimum seconds between strategy evaluations
+
+# Static order parameter templates; copied per order so only the dynamic
+# tail (quantity, price, timestamp) is rebuilt on the hot path.
+_BUY_BASE = collections.OrderedDict(symbol=TRADE_SYMBOL, side='BUY', type='LIMIT', timeInForce='GTC')
+_SELL_BASE = collections.OrderedDict(symbol=TRADE_SYMBOL, side='SELL', type='LIMIT', timeInForce='GTC')
+
+# Shared request headers, built once instead of per call
+_HEADERS = {'X-MBX-APIKEY': API_KEY}
+
+ws_api = None  # Persistent connection to the Binance websocket API for order operations
+_ws_api_pending = {}  # Futures for in-flight websocket API requests, keyed by request id
+WS_API_URL = 'wss://ws-api.binance.com:443/ws-api/v3'
+WS_API_TIMEOUT = 5  # Seconds to wait for a websocket API response
+
+@dataclass(slots=True)
+class BotState:
+    """All mutable trading state, kept in one slotted object."""
+    bids: SortedDict = field(default_factory=lambda: SortedDict(lambda p: -p))  # price -> qty, best bid first
+    asks: SortedDict = field(default_factory=SortedDict)  # price -> qty, best ask first
+    best_bid: float = 0.0  # Best bid price seen on the book
+    best_ask: float = 0.0  # Best ask price seen on the book
+    position_open: bool = False  # Track if there is an open position
+    order_id: int | None = None  # Track the current open order ID
+    last_sell_time: float = 0.0  # Track the time of the last sell order
+    buy_price: float = 0.0  # Track the buy price for the current position
+    position_qty: float = 0.0  # Track the quantity held for the current position
+    current_sell_price: float = 0.0  # Track the current sell price
+    ma_crossed: bool = False  # Track if the MA has crossed up
+    hist: np.ndarray = field(default_factory=lambda: np.zeros(30, dtype=np.float64))  # Close-price ring buffer
+    hist_count: int = 0  # Closes seen so far; the write index is hist_count % 30
+    last_eval: float = 0.0  # Time of the last strategy evaluation
+    book_changed: asyncio.Event = field(default_factory=asyncio.Event)  # Signals a top-of-book move to the strategy loop
+    last_update_id: int = 0  # Sequence cursor for the diff depth stream; 0 means the book needs a snapshot
+    depth_buffer: list = field(default_factory=list)  # Deltas received while a snapshot is in flight
+    resync_book: asyncio.Event = field(default_factory=asyncio.Event)  # Asks the sync loop for a fresh snapshot
+    ma3_sum: float = 0.0  # Running sum of the last 3 prices
+    ma6_sum: float = 0.0  # Running sum of the last 6 prices
+    time_diff: int = 0  # Server/local clock offset in milliseconds
+    min_lot_size: float = 0.0  # Minimum order quantity from the LOT_SIZE filter
+    tick_size: float = 0.0  # Price increment from the PRICE_FILTER filter
+    qty_prec: int = 0  # Decimal places for order quantities, derived from the LOT_SIZE filter
+    price_prec: int = 8  # Decimal places for order prices, derived from the PRICE_FILTER filter
+    qty_scale: float = 1.0  # 10 ** qty_prec, precomputed for the flooring arithmetic
+    price_scale: float = 1e8  # 10 ** price_prec, precomputed for the flooring arithmetic
+
+async def get_server_time_diff(session):
+    """Get the server time difference."""
+    url = 'https://api.binance.com/api/v3/time'
+    async with session.get(url) as response:
+        server_time = _json_loads(await response.read())
+        return server_time['serverTime'] - _now_ms()
+
+_time_ns = time.time_ns  # Pre-bound; skips the module attribute lookup per call
+
+def _now_ms():
+    """Current wall-clock time in milliseconds."""
+    return _time_ns() // 1_000_000
+
+def check_sha_acceleration():
+    """Log the OpenSSL build and warn if HMAC-SHA256 looks un-accelerated."""
+    payload = b'\x00' * (1 << 22)
+    start = time.perf_counter()
+    hmac.digest(API_SECRET, payload, 'sha256')
+    throughput = len(payload) / (time.perf_counter() - start) / 1e6
+    logger.info(f"{ssl.OPENSSL_VERSION}, HMAC-SHA256 throughput: {throughput:.0f} MB/s")
+    if throughput < 500:
+        logger.warning("HMAC-SHA256 throughput is low; this OpenSSL build likely lacks SHA-NI support")
+
+def create_signed_payload(params, recv_window=5000):
+    """Create a signed payload for the API request.
+
+    All parameter values we send are ASCII-safe, so the query string is
+    joined directly instead of going through urlencode's per-value quoting.
+    """
+    params['recvWindow'] = recv_window
+    query_string = '&'.join(f'{k}={v}' for k, v in params.items())
+    params['signature'] = hmac.digest(API_SECRET, query_string.encode('utf-8'), 'sha256').hex()
+    return params
+
+# Static fragments of the order signing string. The websocket API signs the
+# alphabetically sorted parameters, so for a limit order only the price,
+# quantity and timestamp values vary between these fixed pieces.
+_ORDER_SIGN_PREFIX = f'apiKey={API_KEY}&price='.encode()
+_BUY_SIGN_MID = f'&recvWindow=5000&side=BUY&symbol={TRADE_SYMBOL}&timeInForce=GTC&timestamp='.encode()
+_SELL_SIGN_MID = f'&recvWindow=5000&side=SELL&symbol={TRADE_SYMBOL}&timeInForce=GTC&timestamp='.encode()
+_ORDER_SIGN_SUFFIX = b'&type=LIMIT'
+
+def sign_order_query(sign_mid, quantity, price, timestamp):
+    """Sign a limit-order query by concatenating precomputed byte fragments."""
+    query = b''.join((_ORDER_SIGN_PREFIX, price.encode(), b'&quantity=', quantity.encode(),
+                      sign_mid, str(timestamp).encode(), _ORDER_SIGN_SUFFIX))
+    # One-shot digest: dispatches straight to OpenSSL's HMAC without
+    # constructing a Python-level HMAC object per signature.
+    return hmac.digest(API_SECRET, query, 'sha256').hex()
+
+async def ws_api_request(method, params):
+    """Send a request over the websocket API and await its response."""
+    request_id = uuid.uuid4().hex
+    future = asyncio.get_running_loop().create_future()
+    _ws_api_pending[request_id] = future
+    try:
+        await ws_api.send_str(_json_dumps({'id': request_id, 'method': method, 'params': params}).decode())
+        response = await asyncio.wait_for(future, WS_API_TIMEOUT)
+    finally:
+        # Drop the future whether we got an answer, timed out, or the
+        # send itself failed, so _ws_api_pending never leaks entries.
+        _ws_api_pending.pop(request_id, None)
+    if response.get('status') == 200:
+        return response['result']
+    return response.get('error', response)
+
+async def ws_api_dispatcher(ws):
+    """Resolve pending websocket API futures as responses arrive."""
+    try:
+        async for msg in ws:
+            response = _json_loads(msg.data)
+            future = _ws_api_pending.pop(response.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+            else:
+                logger.error(f"Unmatched websocket API response: {response}")
+    finally:
+        # The connection is gone; fail in-flight requests immediately
+        # instead of letting their callers wait out the timeout.
+        for future in _ws_api_pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("websocket API connection closed"))
+        _ws_api_pending.clear()
+
+async def ws_api_connection(session):
+    """Keep the websocket API connection alive, reconnecting when it drops."""
+    global ws_api
+    while True:
+        await ws_api_dispatcher(ws_api)
+        logger.warning("Websocket API connection lost, reconnecting")
+        await asyncio.sleep(1)
+        ws_api = await session.ws_connect(WS_API_URL)
+
+class DepthUpdate(msgspec.Struct):
+    """Binance depthUpdate frame; only the fields the strategy reads."""
+    e: str
+    s: str
+    U: int  # First update ID in this delta
+    u: int  # Final update ID in this delta
+    b: list[tuple[float, float]]
+    a: list[tuple[float, float]]
+
+class Kline(msgspec.Struct):
+    """The kline payload of a kline event."""
+    c: float  # Close price
+    x: bool  # True once the kline is closed
+
+class KlineUpdate(msgspec.Struct):
+    """Binance kline frame; only the fields the strategy reads."""
+    e: str
+    k: Kline
+
+class StreamMessage(msgspec.Struct):
+    """Combined-stream envelope; payload decoding is deferred via Raw."""
+    stream: str
+    data: msgspec.Raw
+
+# Decode straight into the slotted structs above, skipping dict allocation.
+# strict=False lets msgspec's strtod convert Binance's quoted decimals to
+# floats during parsing, so no Python-level float() calls remain.
+_DEPTH_DECODER = msgspec.json.Decoder(DepthUpdate, strict=False)
+_KLINE_DECODER = msgspec.json.Decoder(KlineUpdate, strict=False)
+_STREAM_DECODER = msgspec.json.Decoder(StreamMessage)
+
+def apply_depth_delta(side, levels):
+    """Apply depthUpdate levels to one side of the book in O(log N) each."""
+    for price, quantity in levels:
+        if quantity == 0:
+            side.pop(price, None)
+        else:
+            side[price] = quantity
+
+def update_order_book(state, bids, asks):
+    """Apply a depth delta to the book; return True if the top changed."""
+    apply_depth_delta(state.bids, bids)
+    apply_depth_delta(state.asks, asks)
+    l1_changed = False
+    if state.bids:
+        best_bid = state.bids.peekitem(0)[0]
+        if best_bid != state.best_bid:
+            state.best_bid = best_bid
+            l1_changed = True
+    if state.asks:
+        best_ask = state.asks.peekitem(0)[0]
+        if best_ask != state.best_ask:
+            state.best_ask = best_ask
+            l1_changed = True
+    return l1_changed
+
+async def sync_order_book(session, state):
+    """Bulk-insert a REST depth snapshot and replay the buffered deltas."""
+    url = f'https://api.binance.com/api/v3/depth?symbol={TRADE_SYMBOL}&limit=1000'
+    async with session.get(url) as response:
+        snapshot = _json_loads(await response.read())
+    state.bids.clear()
+    state.asks.clear()
+    state.bids.update((float(p), float(q)) for p, q in snapshot['bids'])
+    state.asks.update((float(p), float(q)) for p, q in snapshot['asks'])
+    state.last_update_id = snapshot['lastUpdateId']
+    for msg in state.depth_buffer:
+        if msg.u > state.last_update_id:
+            apply_depth_delta(state.bids, msg.b)
+            apply_depth_delta(state.asks, msg.a)
+            state.last_update_id = msg.u
+    state.depth_buffer.clear()
+    if state.bids:
+        state.best_bid = state.bids.peekitem(0)[0]
+    if state.asks:
+        state.best_ask = state.asks.peekitem(0)[0]
+    state.book_changed.set()
+    logger.info(f"Order book synced at update {state.last_update_id}")
+
+async def book_sync_loop(session, state):
+    """Resync the book whenever the stream (re)connects or reports a gap."""
+    while True:
+        await state.resync_book.wait()
+        state.resync_book.clear()
+        await sync_order_book(session, state)
+
+async def get_account_balance(session, state, asset, retries=3):
+    """Get the current account balance for the given asset."""
+    url = 'https://api.binance.com/api/v3/account'
+    params = {'timestamp': _now_ms() + state.time_diff}
+    signed_params = create_signed_payload(params)
+    for attempt in range(retries):
+        async with session.get(url, headers=_HEADERS, params=signed_params) as response:
+            account_info = await response.json()
+            if 'balances' in account_info:
+                for balance in account_info['balances']:
+                    if balance['asset'] == asset:
+                        return float(balance['free'])
+            logger.error(f"Error fetching account balance: {account_info}")
+            if 'code' in account_info and account_info['code'] == -1021:
+                state.time_diff = await get_server_time_diff(session)
+    return 0.0
+
+async def get_exchange_info(session):
+    """Fetch exchange information for the trading pair."""
+    url = 'https://api.binance.com/api/v3/exchangeInfo'
+    async with session.get(url) as response:
+        exchange_info = _json_loads(await response.read())
+        for symbol_info in exchange_info['symbols']:
+            if symbol_info['symbol'] == TRADE_SYMBOL:
+                min_lot_size, tick_size = None, None
+                for filter_info in symbol_info['filters']:
+                    if filter_info['filterType'] == 'LOT_SIZE':
+                        min_lot_size = float(filter_info['minQty'])
+                    if filter_info['filterType'] == 'PRICE_FILTER':
+                        tick_size = float(filter_info['tickSize'])
+                return min_lot_size, tick_size
+    return None, None
+
+async def get_historical_prices(session, symbol, interval, limit=100):
+    """Fetch historical price data."""
+    url = f'https://api.binance.com/api/v3/klines?symbol={symbol}&interval={interval}&limit={limit}'
+    async with session.get(url) as response:
+        klines = _json_loads(await response.read())
+        closing_prices = np.fromiter((kline[4] for kline in klines), dtype=np.float64, count=len(klines))
+        logger.info(f"Fetched {len(closing_prices)} historical prices")
+        return closing_prices
+
+def update_moving_averages(state, price):
+    """Update the price ring buffer and running MA sums with a new close."""
+    if state.hist_count >= 3:
+        state.ma3_sum -= state.hist[(state.hist_count - 3) % 30]
+    if state.hist_count >= 6:
+        state.ma6_sum -= state.hist[(state.hist_count - 6) % 30]
+    state.ma3_sum += price
+    state.ma6_sum += price
+    state.hist[state.hist_count % 30] = price
+    state.hist_count += 1
+
+# buy_price + buy_fee + sell_fee + margin collapses to a single multiply:
+# the per-unit fees cancel the quantity out of the formula entirely.
+_MIN_SELL_MULT = 1.0 + 2 * TRADE_FEE_PERCENT + MIN_PROFIT_MARGIN + TRADE_FEE_PERCENT * MIN_PROFIT_MARGIN
+
+def calculate_min_sell_price(buy_price):
+    """Calculate the minimum sell price to cover fees and profit margin."""
+    return buy_price * _MIN_SELL_MULT
+
+@njit(cache=True, fastmath=True)
+def eval_buy_signal(hist_count, ma3_sum, ma6_sum, best_bid, best_ask):
+    """Compiled fast-reject path for the buy signal.
+
+    Returns (signal, min_sell_price); the common no-signal case costs a
+    handful of arithmetic ops with no Python frames.
+    """
+    if hist_count < 30:
+        return False, 0.0
+    if ma3_sum / 3.0 <= ma6_sum / 6.0:
+        return False, 0.0
+    if best_bid <= 0.0 or best_ask <= 0.0:
+        return False, 0.0
+    min_sell_price = best_bid * _MIN_SELL_MULT
+    potential_profit = ((min_sell_price - best_bid) / best_bid) * 100.0
+    if potential_profit < MIN_PROFIT_MARGIN * 100.0:
+        return False, 0.0
+    return True, min_sell_price
+
+async def place_buy_order(session, state, now_ms):
+    """Place a buy order with a fixed USDT amount."""
+    # Cheapest gates first: plain flag reads, then the clock, then the
+    # compiled signal kernel; nothing below formats or signs until all pass.
+    if state.position_open or state.ma_crossed or time.time() - state.last_sell_time < COOLDOWN_PERIOD:
+        logger.debug("Skipping buy order due to open position, cooldown period, or MA cross")
+        return
+
+    best_bid = state.best_bid
+    best_ask = state.best_ask
+    signal, min_sell_price = eval_buy_signal(
+        state.hist_count, state.ma3_sum, state.ma6_sum, best_bid, best_ask)
+    if not signal:
+        logger.debug("No buy signal, skipping buy order")
+        return
+
+    state.buy_price = buy_price = best_bid
+    quantity = ORDER_AMOUNT_USDT / buy_price
+    quantity = math.floor(quantity * state.qty_scale) / state.qty_scale
+    quantity = f"{quantity:.{state.qty_prec}f}"  # Ensure quantity has correct precision
+    if float(quantity) < state.min_lot_size:
+        logger.error(f"Calculated quantity {quantity} is less than minimum lot size {state.min_lot_size}")
+        return
+    price = f"{buy_price:.{state.price_prec}f}"  # Ensure price has correct precision
+    params = _BUY_BASE.copy()
+    params['quantity'] = quantity
+    params['price'] = price
+    params['timestamp'] = now_ms
+    params['apiKey'] = API_KEY
+    params['recvWindow'] = 5000
+    params['signature'] = sign_order_query(_BUY_SIGN_MID, quantity, price, now_ms)
+    order = await ws_api_request('order.place', params)
+    if 'code' in order:
+        logger.error(f"Error placing buy order: {order}")
+    else:
+        logger.info(f"Buy order placed: {order}")
+        state.position_open = True  # Update the position status
+        state.order_id = order['orderId']  # Store the order ID
+        state.position_qty = float(quantity)  # Cache the position size instead of re-fetching the balance
+        state.current_sell_price = best_ask  # Initial sell price based on best ask
+        state.ma_crossed = True  # Set the MA cross flag
+    return order
+
+async def place_sell_order(session, state, now_ms, sell_price=None):
+    """Place a sell order for the full position quantity."""
+    quantity = state.position_qty
+    if quantity <= 0 or state.order_id is not None:
+        return  # Nothing to sell, or an order is already resting
+    quantity = math.floor(quantity * state.qty_scale) / state.qty_scale
+    quantity = f"{quantity:.{state.qty_prec}f}"  # Ensure quantity has correct precision
+    if float(quantity) < state.min_lot_size:
+        logger.error(f"Calculated quantity {quantity} is less than minimum lot size {state.min_lot_size}")
+        return
+    best_bid = state.best_bid
+    if not best_bid:
+        logger.error("Order book is empty, cannot place sell order")
+        return
+
+    min_sell_price = calculate_min_sell_price(state.buy_price)
+    if sell_price is None:
+        if best_bid > min_sell_price:
+            sell_price = best_bid
+        else:
+            sell_price = min_sell_price
+        sell_price = math.floor(sell_price * state.price_scale) / state.price_scale
+    elif sell_price < min_sell_price:
+        sell_price = min_sell_price
+
+    price = f"{sell_price:.{state.price_prec}f}"  # Ensure price has correct precision
+    params = _SELL_BASE.copy()
+    params['quantity'] = quantity
+    params['price'] = price
+    params['timestamp'] = now_ms
+    params['apiKey'] = API_KEY
+    params['recvWindow'] = 5000
+    params['signature'] = sign_order_query(_SELL_SIGN_MID, quantity, price, now_ms)
+    order = await ws_api_request('order.place', params)
+    if 'code' in order:
+        logger.error(f"Error placing sell order: {order}")
+    else:
+        logger.info(f"Sell order placed: {order}")
+        # The position stays open until the FILLED executionReport lands;
+        # the ACK only means the order is resting on the book.
+        state.order_id = order['orderId']
+    return order
+
+async def start_user_data_stream(session):
+    """Obtain a listenKey for the user data stream."""
+    url = 'https://api.binance.com/api/v3/userDataStream'
+    async with session.post(url, headers=_HEADERS) as response:
+        return _json_loads(await response.read())['listenKey']
+
+async def keep_alive_user_data_stream(session, listen_key):
+    """Refresh the listenKey before its 60 minute expiry."""
+    url = 'https://api.binance.com/api/v3/userDataStream'
+    while True:
+        await asyncio.sleep(1800)
+        async with session.put(url, headers=_HEADERS, params={'listenKey': listen_key}) as response:
+            await response.read()
+
+def handle_execution_report(state, report):
+    """Update position state from an executionReport event."""
+    status = report['X']
+    if status == 'FILLED':
+        if report['S'] == 'BUY':
+            # Authoritative even if the order ACK was lost: we hold a fill.
+            state.position_open = True
+            state.buy_price = float(report['L'])  # Last fill price
+            state.position_qty = float(report['z'])  # Cumulative filled quantity
+            state.order_id = None
+        else:
+            state.position_open = False
+            state.order_id = None
+            state.position_qty = 0.0
+            state.last_sell_time = time.time()
+            state.ma_crossed = False
+    elif status in ('CANCELED', 'REJECTED', 'EXPIRED'):
+        state.order_id = None
+        if report['S'] == 'BUY':
+            # Keep whatever portion filled before the order died so the
+            # sell path still unloads it.
+            state.position_qty = float(report['z'])
+        else:
+            # A dead sell leaves the unfilled remainder to re-attempt.
+            state.position_qty = float(report['q']) - float(report['z'])
+        state.position_open = state.position_qty > 0.0
+
+async def listen_to_user_stream(session, state, listen_key):
+    """Track fills and position changes pushed over the user data stream."""
+    async with session.ws_connect(f'wss://stream.binance.com:9443/ws/{listen_key}') as ws:
+        async for msg in ws:
+            event = _json_loads(msg.data)
+            if event.get('e') == 'executionReport':
+                handle_execution_report(state, event)
+
+async def user_stream_connection(session, state):
+    """Keep the user data stream alive; Binance closes it after 24 hours.
+
+    Each reconnect obtains a fresh listenKey and its own keepalive, so
+    fills keep being tracked across the daily server-side close.
+    """
+    while True:
+        listen_key = await start_user_data_stream(session)
+        keepalive = asyncio.create_task(keep_alive_user_data_stream(session, listen_key))
+        try:
+            await listen_to_user_stream(session, state, listen_key)
+        finally:
+            keepalive.cancel()
+        logger.warning("User data stream closed, reconnecting with a fresh listenKey")
+        await asyncio.sleep(1)
+
+async def check_break_even_sell_order(session, state, now_ms):
+    """Check for break-even sell order."""
+    buy_price = state.buy_price
+    if not state.position_open or buy_price == 0 or state.order_id is not None:
+        return
+    best_bid = state.best_bid
+    if not best_bid:
+        logger.error("Order book is empty, cannot check break-even sell order")
+        return
+
+    current_profit = ((best_bid - buy_price) / buy_price) * 100
+
+    min_sell_price = calculate_min_sell_price(buy_price)
+    if current_profit <= SAFETY_PROFIT_THRESHOLD:
+        logger.info("Potential profit is diminishing, placing a sell order at 0.44% profit")
+        await place_sell_order(session, state, now_ms, sell_price=min_sell_price)
+
+async def scalping_strategy(session, state):
+    """Scalping strategy main logic."""
+    # One server-adjusted timestamp shared by every signed request this tick.
+    now_ms = _now_ms() + state.time_diff
+    if state.position_open:
+        # Selling is handled entirely by the break-even/profit-target
+        # check; fills arrive via the user data stream.
+        await check_break_even_sell_order(session, state, now_ms)
+    elif time.time() - state.last_sell_time >= COOLDOWN_PERIOD:
+        await place_buy_order(session, state, now_ms)
+
+async def strategy_loop(session, state):
+    """Run the strategy on top-of-book changes, off the websocket reader.
+
+    The reader only applies book deltas and sets the event; the signed
+    I/O happens here so a slow order round trip never delays frame
+    processing. Changes arriving during the debounce window coalesce
+    into a single evaluation against the freshest book.
+    """
+    while True:
+        await state.book_changed.wait()
+        state.book_changed.clear()
+        elapsed = time.time() - state.last_eval
+        if elapsed < MIN_EVAL_INTERVAL:
+            await asyncio.sleep(MIN_EVAL_INTERVAL - elapsed)
+            state.book_changed.clear()
+        state.last_eval = time.time()
+        try:
+            await scalping_strategy(session, state)
+        except Exception:
+            # A failed tick (timeout, dropped ws-api socket) must not kill
+            # the loop while frames keep flowing; log it and keep trading.
+            logger.exception("Strategy tick failed")
+
+class MarketStreamListener(WSListener):
+    """picows listener for the combined depth + kline market streams."""
+
+    def __init__(self, state):
+        self.state = state
+        self._partial = bytearray()  # Reassembly buffer for fragmented messages
+
+    def on_ws_connected(self, transport: WSTransport):
+        # Fresh connection: buffer deltas until a new snapshot lands.
+        self._partial.clear()
+        self.state.last_update_id = 0
+        self.state.resync_book.set()
+
+    def on_ws_frame(self, transport: WSTransport, frame: WSFrame):
+        if frame.msg_type == WSMsgType.TEXT and frame.fin and not self._partial:
+            payload = frame.get_payload_as_bytes()  # Fast path: whole message in one frame
+        elif frame.msg_type == WSMsgType.TEXT or (frame.msg_type == WSMsgType.CONTINUATION and self._partial):
+            self._partial += frame.get_payload_as_bytes()
+            if not frame.fin:
+                return
+            payload = bytes(self._partial)
+            self._partial.clear()
+        else:
+            return
+        wrapper = _STREAM_DECODER.decode(payload)
+        if '@depth' in wrapper.stream:
+            state = self.state
+            msg_data = _DEPTH_DECODER.decode(wrapper.data)
+            if state.last_update_id == 0:
+                state.depth_buffer.append(msg_data)  # Snapshot in flight
+                return
+            if msg_data.u <= state.last_update_id:
+                return  # Stale delta from before the snapshot
+            if msg_data.U > state.last_update_id + 1:
+                # Dropped frame; the book can no longer be trusted.
+                logger.warning("Depth stream gap detected, resyncing order book")
+                state.last_update_id = 0
+                state.depth_buffer.append(msg_data)
+                state.resync_book.set()
+                return
+            state.last_update_id = msg_data.u
+            if update_order_book(state, msg_data.b, msg_data.a):
+                state.book_changed.set()
+        else:
+            update = _KLINE_DECODER.decode(wrapper.data)
+            if update.k.x:  # Only closed klines feed the moving averages
+                update_moving_averages(self.state, update.k.c)
+
+async def listen_to_market_streams(state):
+    """Websocket listener for the combined depth and kline streams.
+
+    Reconnects on disconnect; on_ws_connected buffers deltas and asks
+    for a fresh snapshot, so the book resyncs on every connection.
+    """
+    symbol = TRADE_SYMBOL.lower()
+    url = f'wss://stream.binance.com:9443/stream?streams={symbol}@depth@100ms/{symbol}@kline_3m'
+    while True:
+        transport, listener = await ws_connect(lambda: MarketStreamListener(state), url)
+        await transport.wait_disconnected()
+        logger.warning("Market stream disconnected, reconnecting")
+        await asyncio.sleep(1)
+
+async def main():
+    """Main execution loop."""
+    global ws_api
+    check_sha_acceleration()
+    # Compile the signal kernel now; a cold first call from the hot path
+    # would stall the event loop for the JIT while streams are live.
+    eval_buy_signal(0, 0.0, 0.0, 0.0, 0.0)
+    state = BotState()
+    connector = aiohttp.TCPConnector(limit=32, limit_per_host=16, ttl_dns_cache=300, keepalive_timeout=75,
+                                     force_close=False, enable_cleanup_closed=True)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=2)) as session:
+        # Warm the connection pool so the first signed call reuses an
+        # established TLS session instead of paying the handshake.
+        async with session.get('https://api.binance.com/api/v3/ping') as response:
+            await response.read()
+        state.time_diff = await get_server_time_diff(session)
+        state.min_lot_size, state.tick_size = await get_exchange_info(session)
+        state.qty_prec = max(0, -int(round(math.log10(state.min_lot_size))))
+        state.price_prec = max(0, -int(round(math.log10(state.tick_size))))
+        state.qty_scale = 10.0 ** state.qty_prec
+        state.price_scale = 10.0 ** state.price_prec
+        usdt_balance = await get_account_balance(session, state, 'USDT')
+        logger.info(f"Available USDT balance: {usdt_balance}")
+        for price in await get_historical_prices(session, TRADE_SYMBOL, '3m'):
+            update_moving_averages(state, price)
+        ws_api = await session.ws_connect(WS_API_URL)
+        dispatcher = asyncio.create_task(ws_api_connection(session))
+        user_stream = asyncio.create_task(user_stream_connection(session, state))
+        strategy = asyncio.create_task(strategy_loop(session, state))
+        book_sync = asyncio.create_task(book_sync_loop(session, state))
+        market = asyncio.create_task(listen_to_market_streams(state))
+        tasks = (market, strategy, book_sync, user_stream, dispatcher)
+        try:
+            # Every task is an endless loop, so any completion is a
+            # failure; stop loudly instead of idling on without it.
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+                raise ConnectionError(f"{task.get_coro().__qualname__} exited unexpectedly")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await ws_api.close()
+
+if __name__ == '__main__':
+    if uvloop is not None:
+        uvloop.install()
+    asyncio.run(main())